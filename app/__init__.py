@@ -1,7 +1,11 @@
 from flask import Flask
 from app.config import Config
 from app.models import db
-from werkzeug.security import generate_password_hash
+from app.analytics import stats
+from app.assets import CompressionMiddleware, init_assets
+from app.startup import configure_sqlite, ensure_schema, sync_admin_password
+from app.ratelimit import like_limiter
+from app.signing import url_signer
 from werkzeug.middleware.proxy_fix import ProxyFix
 from flask_caching import Cache
 import os
@@ -15,22 +19,31 @@ def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
 
-    # 配置ProxyFix中间件，用于在反向代理后正确处理请求
-    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_prefix=1)
+    # 动态响应压缩中间件
+    app.wsgi_app = CompressionMiddleware(app.wsgi_app,
+                                         min_size=app.config['COMPRESS_MIN_SIZE'],
+                                         level=app.config['COMPRESS_LEVEL'],
+                                         content_types=app.config['COMPRESS_MIMETYPES'])
 
-    # 将明文密码转换为哈希
-    if 'ADMIN_PASSWORD' in app.config:
-        app.config['ADMIN_PASSWORD_HASH'] = generate_password_hash(app.config['ADMIN_PASSWORD'])
+    # 配置ProxyFix中间件，用于在反向代理后正确处理请求（只信任 PROXY_COUNT 层代理添加的请求头）
+    proxies = app.config['PROXY_COUNT']
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies, x_host=proxies, x_prefix=proxies)
 
-    # 初始化缓存
-    cache.init_app(app, config={
-        'CACHE_TYPE': 'SimpleCache',
-        'CACHE_DEFAULT_TIMEOUT': 300
-    })
+    # 初始化缓存（后端由 CACHE_TYPE 配置决定）
+    cache.init_app(app)
 
     # 初始化数据库
     db.init_app(app)
 
+    # 初始化浏览/点赞统计缓冲区
+    stats.init_app(app)
+
+    # 初始化点赞限流
+    like_limiter.init_app(app)
+
+    # 图片签名地址（开启后替代按 Referer 的防盗链检查）
+    url_signer.init_app(app)
+
     # 确保上传和缩略图目录存在
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     os.makedirs(app.config['THUMBNAIL_FOLDER'], exist_ok=True)
@@ -43,6 +56,9 @@ def create_app(config_class=Config):
     app.register_blueprint(main_bp)
     app.register_blueprint(admin_bp)
 
+    # 静态文件指纹和预压缩
+    init_assets(app)
+
     # 添加上下文处理器，使网站设置在所有模板中可用
     @app.context_processor
     def inject_site_settings():
@@ -54,8 +70,15 @@ def create_app(config_class=Config):
             db.session.commit()
         return dict(site_settings=settings)
 
-    # 创建数据库表
     with app.app_context():
-        db.create_all()
+        # 必须在建立第一个数据库连接之前设置
+        configure_sqlite(app)
+
+        # 数据库结构版本变化时才创建缺失的表
+        ensure_schema()
+
+        # 将明文密码转换为哈希（密码未修改时复用已保存的哈希）
+        if 'ADMIN_PASSWORD' in app.config:
+            sync_admin_password(app)
 
     return app
@@ -0,0 +1,229 @@
+import atexit
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import exists, func, insert, literal, select, update
+
+from app.models import db, Image, Tag, Like, ImageDailyStat, SiteDailyStat, StatCounter
+from app.server import on_worker_start, on_worker_stop
+
+# 全站计数器名称及首次初始化时用于 COUNT 的模型
+COUNTER_SOURCES = {
+    'images': Image,
+    'tags': Tag,
+    'likes': Like,
+}
+
+
+class StatsBuffer:
+    """浏览/点赞事件缓冲区
+
+    请求中只把事件追加到进程内缓冲区，达到数量阈值或时间间隔后
+    合并为每图每天一行，批量写入 ImageDailyStat，同时累加到全站每日汇总 SiteDailyStat。
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._lock = threading.Lock()
+        self._pending = defaultdict(lambda: [0, 0])  # (image_id, day) -> [views, likes]
+        self._event_count = 0
+        self._last_flush = time.monotonic()
+        self._stop_event = threading.Event()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ANALYTICS_FLUSH_INTERVAL', 30)
+        app.config.setdefault('ANALYTICS_FLUSH_THRESHOLD', 200)
+        self.app = app
+        app.extensions['stats_buffer'] = self
+        # 进程退出前写入尚未刷新的事件
+        atexit.register(self.flush)
+
+    def start(self):
+        """启动后台线程，按刷新间隔定时写入（访问量很低时事件也不会长期滞留）"""
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='stats-flusher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止后台线程并写入剩余事件"""
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stop_event.wait(self.app.config['ANALYTICS_FLUSH_INTERVAL']):
+            self.flush()
+
+    def record_view(self, image_id):
+        """记录一次浏览"""
+        self._record(image_id, views=1, likes=0)
+
+    def record_like(self, image_id, delta):
+        """记录一次点赞（delta=1）或取消点赞（delta=-1）"""
+        self._record(image_id, views=0, likes=delta)
+
+    def _record(self, image_id, views, likes):
+        day = datetime.utcnow().date()
+        with self._lock:
+            entry = self._pending[(image_id, day)]
+            entry[0] += views
+            entry[1] += likes
+            self._event_count += 1
+            due = (self._event_count >= self.app.config['ANALYTICS_FLUSH_THRESHOLD'] or
+                   time.monotonic() - self._last_flush >= self.app.config['ANALYTICS_FLUSH_INTERVAL'])
+        if due:
+            self.flush()
+
+    def flush(self):
+        """把缓冲区中的事件合并写入每日汇总表，返回写入的行数"""
+        with self._lock:
+            pending = self._pending
+            self._pending = defaultdict(lambda: [0, 0])
+            self._event_count = 0
+            self._last_flush = time.monotonic()
+        if not pending or self.app is None:
+            return 0
+
+        try:
+            with self.app.app_context():
+                self._write(pending)
+        except Exception as e:
+            # 写入失败时把事件放回缓冲区，等待下次刷新
+            with self._lock:
+                for key, (views, likes) in pending.items():
+                    entry = self._pending[key]
+                    entry[0] += views
+                    entry[1] += likes
+            self.app.logger.error(f'统计数据写入失败: {e}')
+            return 0
+        return len(pending)
+
+    @staticmethod
+    def _write(pending):
+        table = ImageDailyStat.__table__
+        site_table = SiteDailyStat.__table__
+        site_totals = defaultdict(lambda: [0, 0])  # day -> [views, likes]
+        # 使用独立连接和事务，不影响当前请求的会话
+        with db.engine.begin() as conn:
+            for (image_id, day), (views, likes) in pending.items():
+                result = conn.execute(
+                    update(table)
+                    .where(table.c.image_id == image_id, table.c.day == day,
+                           exists().where(Image.id == image_id))
+                    .values(views=table.c.views + views, likes=table.c.likes + likes)
+                )
+                if result.rowcount == 0:
+                    # 缓冲期间图片可能已被删除，只为仍存在的图片插入汇总行，丢弃其余事件
+                    result = conn.execute(insert(table).from_select(
+                        ['image_id', 'day', 'views', 'likes'],
+                        select(literal(image_id), literal(day), literal(views), literal(likes))
+                        .where(exists().where(Image.id == image_id))
+                    ))
+                    if result.rowcount == 0:
+                        continue
+                site_totals[day][0] += views
+                site_totals[day][1] += likes
+
+            for day, (views, likes) in site_totals.items():
+                result = conn.execute(
+                    update(site_table)
+                    .where(site_table.c.day == day)
+                    .values(views=site_table.c.views + views, likes=site_table.c.likes + likes)
+                )
+                if result.rowcount == 0:
+                    conn.execute(insert(site_table).values(day=day, views=views, likes=likes))
+
+
+stats = StatsBuffer()
+
+# 生产服务器的每个 worker 启动后开启定时刷新，退出前写入剩余事件
+on_worker_start(stats.start)
+on_worker_stop(stats.stop)
+
+
+def adjust_counter(name, delta):
+    """在当前会话中增减全站计数器，随调用方的事务一起提交"""
+    if delta:
+        db.session.execute(
+            update(StatCounter).where(StatCounter.name == name).values(value=StatCounter.value + delta)
+        )
+
+
+def get_counters():
+    """读取全站计数器，缺失的计数器按 COUNT 结果初始化一次"""
+    counters = {counter.name: counter.value for counter in StatCounter.query.all()}
+    missing = [name for name in COUNTER_SOURCES if name not in counters]
+    if missing:
+        for name in missing:
+            counters[name] = COUNTER_SOURCES[name].query.count()
+            db.session.add(StatCounter(name=name, value=counters[name]))
+        try:
+            db.session.commit()
+        except Exception:
+            # 其他进程已同时完成初始化，直接读取其结果
+            db.session.rollback()
+            counters = {counter.name: counter.value for counter in StatCounter.query.all()}
+    return counters
+
+
+def _cutoff(days):
+    """统计窗口的起始日期（包含当天在内共 days 天）"""
+    return datetime.utcnow().date() - timedelta(days=days - 1)
+
+
+def trending_score():
+    """最近一段时间的热度分数（浏览数 + 加权点赞数），用于排序的相关子查询"""
+    days = current_app.config['TRENDING_DAYS']
+    weight = current_app.config['TRENDING_LIKE_WEIGHT']
+    return select(
+        func.coalesce(func.sum(ImageDailyStat.views + ImageDailyStat.likes * weight), 0)
+    ).where(
+        ImageDailyStat.image_id == Image.id,
+        ImageDailyStat.day >= _cutoff(days)
+    ).correlate(Image).scalar_subquery()
+
+
+def period_totals(days):
+    """最近 days 天的浏览数和净点赞数合计（只读取全站每日汇总中的 days 行）"""
+    views, likes = db.session.query(
+        func.coalesce(func.sum(SiteDailyStat.views), 0),
+        func.coalesce(func.sum(SiteDailyStat.likes), 0)
+    ).filter(SiteDailyStat.day >= _cutoff(days)).one()
+    return {'views': views, 'likes': likes}
+
+
+def top_images(days, limit=5):
+    """最近 days 天热度最高的图片，返回 (image, views, likes) 列表
+
+    排行需要聚合窗口内所有图片的每日汇总，结果在共享缓存中保存一个刷新间隔，
+    汇总数据本身也只在刷新时变化。
+    """
+    from app import cache
+
+    key = f'top_images:{_cutoff(days)}:{days}:{limit}'
+    ranking = cache.get(key)
+    if ranking is None:
+        weight = current_app.config['TRENDING_LIKE_WEIGHT']
+        views = func.sum(ImageDailyStat.views)
+        likes = func.sum(ImageDailyStat.likes)
+        # 连接图片表，已删除图片残留的汇总行不占用排行名额
+        ranking = [tuple(row) for row in db.session.query(ImageDailyStat.image_id, views, likes)
+                   .join(Image, Image.id == ImageDailyStat.image_id)
+                   .filter(ImageDailyStat.day >= _cutoff(days))
+                   .group_by(ImageDailyStat.image_id)
+                   .order_by((views + likes * weight).desc())
+                   .limit(limit)]
+        cache.set(key, ranking, timeout=current_app.config['ANALYTICS_FLUSH_INTERVAL'])
+
+    images = {image.id: image for image in Image.query.filter(Image.id.in_([row[0] for row in ranking]))}
+    return [(images[image_id], views, likes) for image_id, views, likes in ranking if image_id in images]
@@ -0,0 +1,226 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import zlib
+
+from flask import request, send_from_directory
+from werkzeug.http import parse_accept_header
+
+try:
+    import brotli
+except ImportError:  # brotli 为可选依赖，未安装时只生成 .gz
+    brotli = None
+
+# 预压缩文件的扩展名及对应的 Content-Encoding，按优先级排列
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+def _file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:10]
+
+
+def _hashed_name(filename, digest):
+    name, ext = os.path.splitext(filename)
+    return f'{name}.{digest}{ext}'
+
+
+def _write_if_missing(path, data):
+    if not os.path.exists(path):
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+
+def build_assets(static_folder, build_folder, extensions, exclude=()):
+    """为静态文件生成带内容哈希的副本及 .gz/.br 预压缩文件
+
+    返回 (manifest, report)，manifest 为 原文件名 -> 带哈希文件名，
+    report 为每个文件的 (原文件名, 原始大小, gzip大小, brotli大小或None)。
+    """
+    manifest = {}
+    report = []
+    exclude = {os.path.abspath(path) for path in exclude}
+    for root, dirs, files in os.walk(static_folder):
+        # 跳过上传目录，其中只有图片且文件数量很多
+        dirs[:] = [d for d in dirs if os.path.abspath(os.path.join(root, d)) not in exclude]
+        for file in sorted(files):
+            if os.path.splitext(file)[1].lower() not in extensions:
+                continue
+            source = os.path.join(root, file)
+            filename = os.path.relpath(source, static_folder).replace(os.sep, '/')
+            hashed = _hashed_name(filename, _file_hash(source))
+            target = os.path.join(build_folder, hashed)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+
+            manifest[filename] = hashed
+            outputs = [target, target + '.gz'] + ([target + '.br'] if brotli is not None else [])
+            if not all(os.path.exists(path) for path in outputs):
+                # 文件内容变化（哈希不同）时才重新压缩，重启时直接复用
+                with open(source, 'rb') as f:
+                    data = f.read()
+                _write_if_missing(target, data)
+                _write_if_missing(target + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+                if brotli is not None:
+                    _write_if_missing(target + '.br', brotli.compress(data, quality=11))
+
+            sizes = [os.path.getsize(path) for path in outputs]
+            report.append((filename, sizes[0], sizes[1], sizes[2] if brotli is not None else None))
+    return manifest, report
+
+
+def encoding_qualities(header):
+    """解析 Accept-Encoding，返回 编码 -> q 值"""
+    return {value.lower(): quality for value, quality in parse_accept_header(header)}
+
+
+def encoding_quality(qualities, encoding):
+    """客户端对某种编码的 q 值，未显式列出时使用 * 的值；为 0 表示不接受"""
+    return qualities.get(encoding, qualities.get('*', 0))
+
+
+def _build(app):
+    build_folder = app.config.get('ASSETS_BUILD_FOLDER') or os.path.join(app.instance_path, 'assets')
+    manifest, report = build_assets(app.static_folder, build_folder, app.config['ASSETS_EXTENSIONS'],
+                                    exclude=(app.config['UPLOAD_FOLDER'], app.config['THUMBNAIL_FOLDER']))
+    return build_folder, manifest, report
+
+
+def init_assets(app):
+    """启动时生成指纹文件，并让 url_for('static', ...) 输出带哈希的文件名"""
+
+    @app.cli.command('build-assets')
+    def build_assets_command():
+        """生成静态资源指纹文件并报告压缩前后的大小"""
+        build_folder, manifest, report = _build(app)
+        print(f'输出目录: {build_folder}')
+        print(f'{"文件":<30}{"原始":>10}{"gzip":>10}{"brotli":>10}')
+        for filename, size, gz_size, br_size in report:
+            br = br_size if br_size is not None else '-'
+            print(f'{manifest[filename]:<30}{size:>10}{gz_size:>10}{br:>10}')
+        total = sum(row[1] for row in report)
+        total_gz = sum(row[2] for row in report)
+        if not total:
+            print('没有静态资源')
+            return
+        print(f'合计: {total} -> {total_gz} 字节 (gzip, {total_gz / total:.0%})')
+        if brotli is not None:
+            total_br = sum(row[3] for row in report)
+            print(f'合计: {total} -> {total_br} 字节 (brotli, {total_br / total:.0%})')
+
+    if not app.config.get('ASSETS_FINGERPRINT', True):
+        return
+
+    build_folder, manifest, _ = _build(app)
+    hashed_files = set(manifest.values())
+    app.extensions['assets_manifest'] = manifest
+
+    @app.url_defaults
+    def fingerprint_static(endpoint, values):
+        if endpoint == 'static' and values.get('filename') in manifest:
+            values['filename'] = manifest[values['filename']]
+
+    send_static_file = app.view_functions['static']
+
+    def static(filename):
+        """带哈希的文件按 Accept-Encoding 返回预压缩版本并长期缓存，其余文件按原方式处理"""
+        if filename not in hashed_files:
+            return send_static_file(filename=filename)
+
+        qualities = encoding_qualities(request.headers.get('Accept-Encoding'))
+        served = filename
+        content_encoding = None
+        best = 0
+        # 选择 q 值最高的已生成版本，q 值相同时按 ENCODINGS 中的顺序
+        for encoding, suffix in ENCODINGS:
+            quality = encoding_quality(qualities, encoding)
+            if quality > best and os.path.exists(os.path.join(build_folder, filename + suffix)):
+                served = filename + suffix
+                content_encoding = encoding
+                best = quality
+
+        response = send_from_directory(build_folder, served, max_age=31536000, conditional=True)
+        if content_encoding:
+            # 类型按原文件名推断，而不是 .gz/.br
+            response.mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            response.headers['Content-Encoding'] = content_encoding
+        response.cache_control.immutable = True
+        response.cache_control.public = True
+        response.vary.add('Accept-Encoding')
+        return response
+
+    app.view_functions['static'] = static
+
+
+class CompressionMiddleware:
+    """动态响应的流式 gzip 压缩（WSGI 中间件）
+
+    只压缩客户端接受 gzip、状态为 200、类型可压缩且未设置 Content-Encoding 的响应；
+    已知长度小于 min_size 的响应不压缩，长度未知（流式）的响应按块压缩并逐块刷新输出。
+    """
+
+    def __init__(self, app, min_size=1024, level=6, content_types=()):
+        self.app = app
+        self.min_size = min_size
+        self.level = level
+        self.content_types = set(content_types)
+
+    def _compressible(self, status, headers):
+        values = {key.lower(): value for key, value in headers}
+        mimetype = values.get('content-type', '').split(';')[0].strip().lower()
+        return mimetype in self.content_types and 'content-encoding' not in values, values
+
+    def __call__(self, environ, start_response):
+        qualities = encoding_qualities(environ.get('HTTP_ACCEPT_ENCODING'))
+        accepts_gzip = encoding_quality(qualities, 'gzip') > 0
+        state = {'started': False, 'compress': False}
+
+        def _start_response(status, headers, exc_info=None):
+            state['started'] = True
+            compressible, values = self._compressible(status, headers)
+            if compressible:
+                headers = [(key, value) for key, value in headers if key.lower() != 'vary']
+                vary = [v.strip() for v in values.get('vary', '').split(',') if v.strip()]
+                if 'accept-encoding' not in {v.lower() for v in vary}:
+                    vary.append('Accept-Encoding')
+                headers.append(('Vary', ', '.join(vary)))
+
+                length = values.get('content-length')
+                if (accepts_gzip and status.startswith('200')
+                        and environ.get('REQUEST_METHOD') != 'HEAD'
+                        and (length is None or int(length) >= self.min_size)):
+                    headers = [(key, value) for key, value in headers
+                               if key.lower() not in ('content-length', 'etag')]
+                    headers.append(('Content-Encoding', 'gzip'))
+                    state['compress'] = True
+            return start_response(status, headers, exc_info)
+
+        app_iter = self.app(environ, _start_response)
+        if state['started'] and not state['compress']:
+            # 原样返回，保留 wsgi.file_wrapper 等服务器优化
+            return app_iter
+        return self._iter(app_iter, state)
+
+    def _iter(self, app_iter, state):
+        compressor = None
+        try:
+            for chunk in app_iter:
+                if not state['compress']:
+                    yield chunk
+                    continue
+                if compressor is None:
+                    # wbits=31 表示输出 gzip 格式
+                    compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+                if not chunk:
+                    continue
+                # 每个块都同步刷新，上游逐块产出时客户端能立即收到，而不是等 zlib 缓冲区填满
+                yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if state['compress']:
+                if compressor is None:
+                    compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+                yield compressor.flush()
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
@@ -0,0 +1,242 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from flask_caching.backends.base import BaseCache
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB,
+    expires REAL NOT NULL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL,
+    counter INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+CREATE TABLE IF NOT EXISTS cache_meta (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_meta (name, value) VALUES ('bytes', 0);
+CREATE TRIGGER IF NOT EXISTS cache_size_insert AFTER INSERT ON cache BEGIN
+    UPDATE cache_meta SET value = value + NEW.size WHERE name = 'bytes';
+END;
+CREATE TRIGGER IF NOT EXISTS cache_size_delete AFTER DELETE ON cache BEGIN
+    UPDATE cache_meta SET value = value - OLD.size WHERE name = 'bytes';
+END;
+CREATE TRIGGER IF NOT EXISTS cache_size_update AFTER UPDATE OF size ON cache BEGIN
+    UPDATE cache_meta SET value = value - OLD.size + NEW.size WHERE name = 'bytes';
+END;
+"""
+
+# 使用 UPSERT 而不是 INSERT OR REPLACE：后者隐式删除旧行时不会触发 DELETE 触发器
+_UPSERT = (
+    'INSERT INTO cache (key, value, expires, size, accessed) VALUES (?, ?, ?, ?, ?) '
+    'ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires, '
+    'size = excluded.size, accessed = excluded.accessed, counter = 0'
+)
+
+# inc/dec 创建的计数器以 INTEGER 原样存储并标记 counter = 1，其余值（包括 set 写入的整数）序列化为 BLOB
+_COUNTER_SIZE = 8
+
+
+class SQLiteCache(BaseCache):
+    """基于 SQLite 文件的缓存后端，同一主机上的所有 worker 进程共享
+
+    - 过期时间：每条记录保存到期时间戳，读取时惰性判断
+    - 容量限制：触发器维护总字节数，超出 max_bytes 时按最近访问时间淘汰（LRU），只淘汰到回到容量以内
+    - 计数器：inc/dec 在单条 SQL 语句中完成，可作为跨进程的版本号用于缓存失效；
+      只有 inc/dec 创建的计数器不参与 LRU 淘汰（否则版本号被淘汰后从 1 重新计数，旧版本的缓存会再次命中）
+    """
+
+    def __init__(self, path, default_timeout=300, max_bytes=64 * 1024 * 1024,
+                 lru_resolution=1.0, busy_timeout=5.0, ignore_delete_many_errors=False):
+        super().__init__(default_timeout=default_timeout,
+                         ignore_delete_many_errors=ignore_delete_many_errors)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lru_resolution = lru_resolution  # 访问时间的更新粒度（秒），避免每次读取都写库
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn.executescript(_SCHEMA)
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(cache)')}
+        if 'counter' not in columns:
+            # 旧版本创建的缓存文件：其中的数据都可以丢弃，直接清空后补充列
+            self._conn.execute('DELETE FROM cache')
+            self._conn.execute('ALTER TABLE cache ADD COLUMN counter INTEGER NOT NULL DEFAULT 0')
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        path = config.get('CACHE_SQLITE_PATH') or os.path.join(app.instance_path, 'cache.sqlite')
+        kwargs.update(dict(
+            path=path,
+            max_bytes=config.get('CACHE_SQLITE_MAX_BYTES', 64 * 1024 * 1024),
+        ))
+        return cls(*args, **kwargs)
+
+    @property
+    def _conn(self):
+        """每个线程一个连接；fork 后的子进程重新建立连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout,
+                                   isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _expires_at(self, timeout):
+        timeout = self._normalize_timeout(timeout)
+        return time.time() + timeout if timeout > 0 else 0
+
+    @staticmethod
+    def _dump(value):
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        return data, len(data)
+
+    @staticmethod
+    def _load(value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def _total_bytes(self):
+        return self._conn.execute("SELECT value FROM cache_meta WHERE name = 'bytes'").fetchone()[0]
+
+    def _evict(self):
+        """删除过期记录，仍超出容量时从最久未访问的记录开始淘汰，直到回到容量以内"""
+        if self._total_bytes() <= self.max_bytes:
+            return
+        conn = self._conn
+        # 在同一个写事务中计算和删除，避免多个进程同时淘汰时重复删除
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM cache WHERE expires != 0 AND expires <= ?', (time.time(),))
+            excess = self._total_bytes() - self.max_bytes
+            victims = []
+            if excess > 0:
+                cursor = conn.execute(
+                    "SELECT key, size FROM cache WHERE counter = 0 ORDER BY accessed"
+                )
+                for key, size in cursor:
+                    victims.append((key,))
+                    excess -= size
+                    if excess <= 0:
+                        break
+                cursor.close()
+            conn.executemany('DELETE FROM cache WHERE key = ?', victims)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def get(self, key):
+        row = self._conn.execute(
+            'SELECT value, expires, accessed FROM cache WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires, accessed = row
+        now = time.time()
+        if expires != 0 and expires <= now:
+            self._conn.execute('DELETE FROM cache WHERE key = ? AND expires = ?', (key, expires))
+            return None
+        if now - accessed >= self.lru_resolution:
+            self._conn.execute('UPDATE cache SET accessed = ? WHERE key = ?', (now, key))
+        try:
+            return self._load(value)
+        except (pickle.PickleError, EOFError, AttributeError, ImportError):
+            return None
+
+    def get_many(self, *keys):
+        return [self.get(key) for key in keys]
+
+    def has(self, key):
+        row = self._conn.execute('SELECT expires FROM cache WHERE key = ?', (key,)).fetchone()
+        return row is not None and (row[0] == 0 or row[0] > time.time())
+
+    def set(self, key, value, timeout=None):
+        data, size = self._dump(value)
+        self._conn.execute(
+            _UPSERT,
+            (key, data, self._expires_at(timeout), size, time.time())
+        )
+        self._evict()
+        return True
+
+    def add(self, key, value, timeout=None):
+        data, size = self._dump(value)
+        now = time.time()
+        # 仅当键不存在或已过期时写入
+        cursor = self._conn.execute(
+            'INSERT INTO cache (key, value, expires, size, accessed) VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires, '
+            'size = excluded.size, accessed = excluded.accessed, counter = 0 '
+            'WHERE cache.expires != 0 AND cache.expires <= ?',
+            (key, data, self._expires_at(timeout), size, now, now)
+        )
+        if cursor.rowcount:
+            self._evict()
+        return cursor.rowcount > 0
+
+    def set_many(self, mapping, timeout=None):
+        expires = self._expires_at(timeout)
+        now = time.time()
+        rows = []
+        for key, value in mapping.items():
+            data, size = self._dump(value)
+            rows.append((key, data, expires, size, now))
+        conn = self._conn
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(_UPSERT, rows)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        self._evict()
+        return list(mapping.keys())
+
+    def delete(self, key):
+        return self._conn.execute('DELETE FROM cache WHERE key = ?', (key,)).rowcount > 0
+
+    def delete_many(self, *keys):
+        deleted = []
+        for key in keys:
+            if self.delete(key):
+                deleted.append(key)
+            elif not self.ignore_delete_many_errors:
+                break
+        return deleted
+
+    def clear(self):
+        self._conn.execute('DELETE FROM cache')
+        return True
+
+    def inc(self, key, delta=1):
+        """原子地增加计数器并返回新值；键中存放的不是计数器时返回 None"""
+        # 已过期的记录视为不存在，从 delta 重新计数
+        rows = self._conn.execute(
+            'INSERT INTO cache (key, value, expires, size, accessed, counter) VALUES (?, ?, 0, ?, ?, 1) '
+            'ON CONFLICT (key) DO UPDATE SET '
+            'value = CASE WHEN cache.expires != 0 AND cache.expires <= excluded.accessed '
+            'THEN excluded.value ELSE cache.value + excluded.value END, '
+            'expires = CASE WHEN cache.expires != 0 AND cache.expires <= excluded.accessed '
+            'THEN 0 ELSE cache.expires END, '
+            'size = excluded.size, accessed = excluded.accessed, counter = 1 '
+            'WHERE cache.counter = 1 '
+            'OR (cache.expires != 0 AND cache.expires <= excluded.accessed) '
+            'RETURNING value',
+            (key, delta, _COUNTER_SIZE, time.time())
+        ).fetchall()
+        return rows[0][0] if rows else None
+
+    def dec(self, key, delta=1):
+        return self.inc(key, -delta)
@@ -8,9 +8,12 @@ class Config:
     # 数据库配置
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///gallery.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # SQLite 连接参数：WAL 模式下读写互不阻塞，synchronous=NORMAL 在断电时可能丢失最后几次提交但不会损坏数据库
+    SQLITE_PRAGMAS = {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'busy_timeout': 5000}
 
     # URL生成配置（用于反向代理环境）
     PREFERRED_URL_SCHEME = 'http'  # 如果使用HTTPS，改为'https'
+    PROXY_COUNT = 1  # 前面的反向代理层数，直接对外提供服务时设为0（否则客户端可伪造 X-Forwarded-For）
     
     # 上传配置
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'app', 'static', 'uploads')
@@ -25,12 +28,45 @@ class Config:
     # 分页配置
     IMAGES_PER_PAGE = 12
 
+    # 缓存配置（SQLite 文件缓存，同一主机上的所有 worker 进程共享）
+    CACHE_TYPE = 'app.cache_backend.SQLiteCache'
+    CACHE_DEFAULT_TIMEOUT = 300
+    CACHE_SQLITE_PATH = None  # 缓存文件路径，默认为 instance/cache.sqlite
+    CACHE_SQLITE_MAX_BYTES = 64 * 1024 * 1024  # 缓存总容量，超出后按 LRU 淘汰
+
+    # 静态资源与压缩配置
+    ASSETS_FINGERPRINT = True  # 启动时生成带内容哈希的静态文件及 .gz/.br 预压缩文件
+    ASSETS_BUILD_FOLDER = None  # 生成文件的目录，默认为 instance/assets
+    ASSETS_EXTENSIONS = {'.css', '.js', '.svg'}
+    COMPRESS_MIN_SIZE = 1024  # 动态响应达到该字节数才压缩
+    COMPRESS_LEVEL = 6
+    COMPRESS_MIMETYPES = {'text/html', 'application/json', 'text/css', 'application/javascript',
+                          'text/javascript', 'text/plain', 'image/svg+xml'}
+
+    # 点赞限流（按IP的令牌桶）
+    LIKE_RATE_LIMIT = 1  # 每秒补充的令牌数
+    LIKE_RATE_BURST = 10  # 令牌桶容量，即允许的突发请求数
+
+    # 统计配置
+    ANALYTICS_FLUSH_INTERVAL = 30  # 浏览/点赞事件缓冲区最长刷新间隔（秒）
+    ANALYTICS_FLUSH_THRESHOLD = 200  # 缓冲事件数达到该值时立即刷新
+    TRENDING_DAYS = 7  # "热门"排序统计最近几天的数据
+    TRENDING_LIKE_WEIGHT = 5  # 计算热度时一次点赞相当于几次浏览
+
+    # 生产服务器配置（python serve.py，命令行参数优先）
+    SERVER_BIND = '0.0.0.0:5000'
+    SERVER_WORKERS = None  # worker 进程数，None 表示使用 CPU 核数
+    SERVER_THREADS = 4  # 每个 worker 的线程数
+    SERVER_GRACEFUL_TIMEOUT = 30  # 平滑关闭时等待在途请求的秒数
+
     # 管理员密码（明文，启动时会自动转换为哈希）
     # 修改此密码后重启应用即可生效
     ADMIN_PASSWORD = 'admin'
 
     # 防盗链配置
-    ENABLE_HOTLINK_PROTECTION = True  # 是否启用防盗链
+    ENABLE_HOTLINK_PROTECTION = True  # 是否启用防盗链（按 Referer 检查，开启 SIGNED_URLS 后不再使用）
+    SIGNED_URLS = False  # 图片地址附带有时效的签名，可被前端代理/CDN缓存
+    SIGNED_URL_TTL = 3600  # 签名时间窗口（秒），地址的有效期在 1 到 2 倍之间
     ALLOWED_DOMAINS = [
         'localhost',
         '127.0.0.1',
@@ -23,6 +23,7 @@ class Image(db.Model):
     # 关系
     tags = db.relationship('Tag', secondary=image_tags, backref=db.backref('images', lazy='dynamic'))
     likes = db.relationship('Like', backref='image', lazy='dynamic', cascade='all, delete-orphan')
+    daily_stats = db.relationship('ImageDailyStat', backref='image', lazy='dynamic', cascade='all, delete-orphan')
     
     @property
     def like_count(self):
@@ -56,6 +57,40 @@ class Like(db.Model):
         return f'<Like image_id={self.image_id} ip={self.ip_address}>'
 
 
+class ImageDailyStat(db.Model):
+    """图片每日统计汇总（由统计缓冲区定期写入）"""
+    id = db.Column(db.Integer, primary_key=True)
+    image_id = db.Column(db.Integer, db.ForeignKey('image.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False, index=True)
+    views = db.Column(db.Integer, nullable=False, default=0)
+    likes = db.Column(db.Integer, nullable=False, default=0)  # 当日净点赞数（取消点赞记为-1）
+
+    # 每张图片每天只有一行汇总
+    __table_args__ = (db.UniqueConstraint('image_id', 'day', name='unique_image_day'),)
+
+    def __repr__(self):
+        return f'<ImageDailyStat image_id={self.image_id} day={self.day}>'
+
+
+class SiteDailyStat(db.Model):
+    """全站每日统计汇总，仪表盘的近期合计只需读取最近几天的行"""
+    day = db.Column(db.Date, primary_key=True)
+    views = db.Column(db.Integer, nullable=False, default=0)
+    likes = db.Column(db.Integer, nullable=False, default=0)  # 当日净点赞数（取消点赞记为-1）
+
+    def __repr__(self):
+        return f'<SiteDailyStat day={self.day}>'
+
+
+class StatCounter(db.Model):
+    """全站计数器（图片数、标签数、点赞数），随写操作增量维护"""
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<StatCounter {self.name}={self.value}>'
+
+
 class Announcement(db.Model):
     """公告模型"""
     id = db.Column(db.Integer, primary_key=True)
@@ -75,3 +110,12 @@ class SiteSettings(db.Model):
 
     def __repr__(self):
         return f'<SiteSettings {self.id}>'
+
+
+class AppMeta(db.Model):
+    """应用元数据（键值对），如数据库结构版本、管理员密码哈希"""
+    key = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Text, nullable=False)
+
+    def __repr__(self):
+        return f'<AppMeta {self.key}>'
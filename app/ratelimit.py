@@ -0,0 +1,72 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import jsonify, request
+
+from app.utils import get_client_ip
+
+
+class TokenBucketLimiter:
+    """按客户端IP的令牌桶限流器（进程内存储）
+
+    每个IP的桶以 rate 个/秒的速度补充令牌，最多存 burst 个，每次请求消耗一个。
+    只保留最近活跃的 max_keys 个IP，内存占用有上限。多进程部署时每个 worker 各自计数。
+    rate 和 burst 在 init_app 时从 rate_config / burst_config 指定的配置项读取。
+    """
+
+    def __init__(self, rate_config, burst_config, max_keys=100000):
+        self.rate_config = rate_config
+        self.burst_config = burst_config
+        self.rate = 1.0
+        self.burst = 10
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (剩余令牌, 上次更新时间)
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        rate = app.config[self.rate_config]
+        burst = app.config[self.burst_config]
+        if rate <= 0:
+            raise ValueError(f'{self.rate_config} 必须大于0')
+        if burst < 1:
+            raise ValueError(f'{self.burst_config} 至少为1')
+        self.rate = rate
+        self.burst = burst
+
+    def consume(self, key):
+        """消耗一个令牌，成功返回0，否则返回需要等待的秒数"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+like_limiter = TokenBucketLimiter('LIKE_RATE_LIMIT', 'LIKE_RATE_BURST')
+
+
+def rate_limited(limiter):
+    """限流装饰器，超出限制时返回429，不会访问数据库"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            wait = limiter.consume(get_client_ip(request))
+            if wait:
+                response = jsonify({'success': False, 'message': '操作过于频繁，请稍后再试'})
+                response.status_code = 429
+                response.headers['Retry-After'] = str(math.ceil(wait))
+                return response
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
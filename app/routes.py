@@ -1,12 +1,20 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, session, send_from_directory, abort
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, session, send_from_directory, abort, Response, stream_with_context
 from app.models import db, Image, Tag, Like, Announcement, SiteSettings
-from app.utils import allowed_file, create_thumbnail, get_client_ip
+from app.utils import allowed_file, create_thumbnail, get_client_ip, render_markdown
+from app.analytics import stats, adjust_counter, get_counters, trending_score, period_totals, top_images
+from app.zipstream import ZipStream
+from app.startup import get_admin_password_hash, save_admin_password
+from app.ratelimit import like_limiter, rate_limited
+from app.signing import url_signer
 from werkzeug.utils import secure_filename
-from werkzeug.security import check_password_hash, generate_password_hash
+from werkzeug.security import check_password_hash
 import os
+import hashlib
+from datetime import datetime
 from flask import current_app
+from sqlalchemy import delete, exists, func, insert, literal, select
 from functools import wraps
-from urllib.parse import urlparse
+from urllib.parse import urlparse, quote
 
 main_bp = Blueprint('main', __name__)
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
@@ -49,6 +57,108 @@ def check_referer():
     return False
 
 
+# 公告HTML片段
+def announcement_cache_key(content):
+    """公告HTML片段的缓存键，包含内容版本（内容的哈希）"""
+    version = hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]
+    return f'announcement_html:{version}'
+
+
+def get_announcement_html(announcement):
+    """获取渲染后的公告HTML，缓存中没有时（如被淘汰）重新渲染"""
+    from app import cache
+
+    key = announcement_cache_key(announcement.content)
+    html = cache.get(key)
+    if html is None:
+        html = render_markdown(announcement.content)
+        cache.set(key, html, timeout=0)
+    return html
+
+
+def images_with_tags(tag_ids):
+    """包含任一所选标签的图片查询（筛选页和打包下载共用）"""
+    return Image.query.join(Image.tags).filter(Tag.id.in_(tag_ids)).distinct()
+
+
+def zip_download(filenames, download_name):
+    """以流式ZIP返回原图，支持单段Range请求以便断点续传"""
+    from app import cache
+
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    archive = ZipStream([(name, os.path.join(upload_folder, name)) for name in filenames],
+                        crc_cache=cache.cache)
+    if not archive.entries:
+        # 没有匹配的图片或原图文件都不存在，不返回空的压缩包
+        abort(404)
+
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'ETag': f'"{archive.etag}"',
+        'Content-Disposition': f"attachment; filename=\"gallery.zip\"; filename*=UTF-8''{quote(download_name)}",
+    }
+    start, stop, status = 0, archive.size, 200
+
+    # 只有 If-Range 与当前归档一致时才按范围返回，否则返回完整文件
+    if_range = request.if_range
+    range_valid = if_range.date is None and if_range.etag in (None, archive.etag)
+    if request.range and len(request.range.ranges) == 1 and range_valid:
+        byte_range = request.range.range_for_length(archive.size)
+        if byte_range is None:
+            return Response(status=416, headers={'Content-Range': f'bytes */{archive.size}'})
+        start, stop = byte_range
+        status = 206
+        headers['Content-Range'] = f'bytes {start}-{stop - 1}/{archive.size}'
+    headers['Content-Length'] = str(stop - start)
+
+    return Response(stream_with_context(archive.iter_range(start, stop)),
+                    status=status, mimetype='application/zip', headers=headers)
+
+
+def _insert_ignore(table):
+    """INSERT 语句，遇到唯一约束冲突时忽略（不支持的数据库退化为普通 INSERT）"""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect in ('mysql', 'mariadb'):
+        return insert(table).prefix_with('IGNORE')
+    else:
+        return insert(table)
+    return dialect_insert(table).on_conflict_do_nothing()
+
+
+def toggle_like(image_id, ip_address):
+    """在一个事务中切换点赞状态，返回 (是否已点赞, 点赞数)，图片不存在时返回None"""
+    likes = Like.__table__
+    match = (likes.c.image_id == image_id) & (likes.c.ip_address == ip_address)
+
+    # 先尝试取消点赞；没有可删除的记录再插入，重复点击时由唯一约束去重
+    if db.session.execute(delete(likes).where(match)).rowcount:
+        liked, delta = False, -1
+    else:
+        row = select(
+            literal(image_id), literal(ip_address), literal(datetime.utcnow(), type_=db.DateTime)
+        ).where(exists().where(Image.id == image_id))
+        stmt = _insert_ignore(likes).from_select(['image_id', 'ip_address', 'created_at'], row)
+        delta = db.session.execute(stmt).rowcount
+        if not delta and db.session.get(Image, image_id) is None:
+            db.session.rollback()
+            return None
+        liked = True
+
+    like_count = db.session.execute(
+        select(func.count()).select_from(likes).where(likes.c.image_id == image_id)
+    ).scalar()
+    adjust_counter('likes', delta)
+    db.session.commit()
+
+    if delta:
+        stats.record_like(image_id, delta)
+    return liked, like_count
+
+
 # ==================== 前台路由 ====================
 
 @main_bp.route('/')
@@ -64,6 +174,7 @@ def index():
 
     return render_template('index.html',
                          announcement=announcement,
+                         announcement_html=get_announcement_html(announcement),
                          title='首页')
 
 
@@ -98,7 +209,7 @@ def filter_images():
     """筛选页面 - 根据标签筛选图片，支持排序"""
     page = request.args.get('page', 1, type=int)
     tag_ids = request.args.getlist('tags', type=int)
-    sort_by = request.args.get('sort', 'date')  # date, views, likes
+    sort_by = request.args.get('sort', 'date')  # date, views, likes, trending
     per_page = current_app.config['IMAGES_PER_PAGE']
 
     # 获取所有标签供筛选使用
@@ -106,7 +217,7 @@ def filter_images():
 
     # 如果选择了标签，进行筛选
     if tag_ids:
-        query = Image.query.join(Image.tags).filter(Tag.id.in_(tag_ids)).distinct()
+        query = images_with_tags(tag_ids)
     else:
         query = Image.query
 
@@ -118,6 +229,9 @@ def filter_images():
         from sqlalchemy import func, select
         like_count = select(func.count(Like.id)).where(Like.image_id == Image.id).correlate(Image).scalar_subquery()
         query = query.order_by(like_count.desc())
+    elif sort_by == 'trending':
+        # 按最近几天的浏览和点赞汇总计算热度
+        query = query.order_by(trending_score().desc(), Image.upload_date.desc())
     else:  # date
         query = query.order_by(Image.upload_date.desc())
 
@@ -149,6 +263,7 @@ def image_detail(image_id):
     # 增加浏览次数
     image.views += 1
     db.session.commit()
+    stats.record_view(image_id)
     
     # 检查当前用户是否已点赞
     client_ip = get_client_ip(request)
@@ -162,43 +277,62 @@ def image_detail(image_id):
 
 
 @main_bp.route('/api/like/<int:image_id>', methods=['POST'])
+@rate_limited(like_limiter)
 def like_image(image_id):
-    """点赞图片API"""
-    image = Image.query.get_or_404(image_id)
-    client_ip = get_client_ip(request)
-
-    # 检查是否已点赞
-    existing_like = Like.query.filter_by(image_id=image_id, ip_address=client_ip).first()
+    """点赞图片API（再次点击取消点赞）"""
+    result = toggle_like(image_id, get_client_ip(request))
+    if result is None:
+        abort(404)
 
-    if existing_like:
-        # 取消点赞
-        db.session.delete(existing_like)
-        db.session.commit()
-        return jsonify({'success': True, 'liked': False, 'like_count': image.like_count})
-    else:
-        # 添加点赞
-        new_like = Like(image_id=image_id, ip_address=client_ip)
-        db.session.add(new_like)
-        db.session.commit()
-        return jsonify({'success': True, 'liked': True, 'like_count': image.like_count})
+    liked, like_count = result
+    return jsonify({'success': True, 'liked': liked, 'like_count': like_count})
 
 
 # ==================== 图片访问路由（带防盗链保护） ====================
 
+@main_bp.route('/export/zip')
+def export_zip():
+    """打包下载所选标签的全部原图（带防盗链保护）"""
+    if not check_referer():
+        abort(403)
+
+    tag_ids = request.args.getlist('tags', type=int)
+    if not tag_ids:
+        abort(400)
+
+    query = images_with_tags(tag_ids).order_by(Image.upload_date.desc())
+    filenames = [row.filename for row in query.with_entities(Image.filename)]
+    tag_names = [tag.name for tag in Tag.query.filter(Tag.id.in_(tag_ids)).order_by(Tag.name)]
+    return zip_download(filenames, f"壁纸_{'_'.join(tag_names) or 'export'}.zip")
+
+
+def send_image(folder, kind, filename):
+    """返回图片文件
+
+    开启签名地址时只校验签名，响应与 Referer 无关，允许代理缓存到签名过期为止；
+    否则按 Referer 检查防盗链。
+    """
+    if url_signer.enabled:
+        remaining = url_signer.verify(kind, filename, request.args.get('expires'), request.args.get('sig'))
+        if remaining is None:
+            abort(403)
+        return send_from_directory(folder, filename, max_age=remaining)
+
+    if not check_referer():
+        abort(403)  # 禁止访问
+    return send_from_directory(folder, filename)
+
+
 @main_bp.route('/uploads/<path:filename>')
 def serve_upload(filename):
     """提供原图访问（带防盗链保护）"""
-    if not check_referer():
-        abort(403)  # 禁止访问
-    return send_from_directory(current_app.config['UPLOAD_FOLDER'], filename)
+    return send_image(current_app.config['UPLOAD_FOLDER'], 'uploads', filename)
 
 
 @main_bp.route('/thumbnails/<path:filename>')
 def serve_thumbnail(filename):
     """提供缩略图访问（带防盗链保护）"""
-    if not check_referer():
-        abort(403)  # 禁止访问
-    return send_from_directory(current_app.config['THUMBNAIL_FOLDER'], filename)
+    return send_image(current_app.config['THUMBNAIL_FOLDER'], 'thumbnails', filename)
 
 
 # ==================== 管理后台路由 ====================
@@ -212,7 +346,7 @@ def login():
     if request.method == 'POST':
         password = request.form.get('password', '')
 
-        if check_password_hash(current_app.config['ADMIN_PASSWORD_HASH'], password):
+        if check_password_hash(get_admin_password_hash() or '', password):
             session['admin_logged_in'] = True
             flash('登录成功！', 'success')
             return redirect(url_for('admin.dashboard'))
@@ -240,7 +374,7 @@ def change_password():
         confirm_password = request.form.get('confirm_password', '')
 
         # 验证旧密码
-        if not check_password_hash(current_app.config['ADMIN_PASSWORD_HASH'], old_password):
+        if not check_password_hash(get_admin_password_hash() or '', old_password):
             flash('旧密码错误！', 'error')
             return redirect(request.url)
 
@@ -269,9 +403,8 @@ def change_password():
         with open(config_path, 'w', encoding='utf-8') as f:
             f.write(content)
 
-        # 更新当前配置
-        current_app.config['ADMIN_PASSWORD'] = new_password
-        current_app.config['ADMIN_PASSWORD_HASH'] = generate_password_hash(new_password)
+        # 更新当前配置并保存新的密码哈希
+        save_admin_password(current_app, new_password)
 
         flash('密码修改成功！请妥善保管新密码。', 'success')
         return redirect(url_for('admin.dashboard'))
@@ -283,16 +416,20 @@ def change_password():
 @login_required
 def dashboard():
     """管理后台首页"""
-    total_images = Image.query.count()
-    total_tags = Tag.query.count()
-    total_likes = Like.query.count()
-    
+    # 先写入本进程缓冲的事件，再从计数器和每日汇总表读取统计数据
+    stats.flush()
+    counters = get_counters()
+    days = current_app.config['TRENDING_DAYS']
+
     recent_images = Image.query.order_by(Image.upload_date.desc()).limit(5).all()
-    
+
     return render_template('admin/dashboard.html',
-                         total_images=total_images,
-                         total_tags=total_tags,
-                         total_likes=total_likes,
+                         total_images=counters['images'],
+                         total_tags=counters['tags'],
+                         total_likes=counters['likes'],
+                         trending_days=days,
+                         period_totals=period_totals(days),
+                         trending_images=top_images(days),
                          recent_images=recent_images)
 
 
@@ -341,6 +478,7 @@ def upload_image():
                 if not tag:
                     tag = Tag(name=tag_name)
                     db.session.add(tag)
+                    adjust_counter('tags', 1)
                 tags.append(tag)
 
         # 批量处理文件
@@ -389,6 +527,7 @@ def upload_image():
                 error_count += 1
 
         # 提交所有更改
+        adjust_counter('images', success_count)
         db.session.commit()
 
         if success_count > 0:
@@ -421,6 +560,7 @@ def edit_image(image_id):
                 if not tag:
                     tag = Tag(name=tag_name)
                     db.session.add(tag)
+                    adjust_counter('tags', 1)
                 image.tags.append(tag)
         
         db.session.commit()
@@ -447,6 +587,8 @@ def delete_image(image_id):
         pass
 
     # 删除数据库记录
+    adjust_counter('images', -1)
+    adjust_counter('likes', -image.like_count)
     db.session.delete(image)
     db.session.commit()
 
@@ -476,14 +618,33 @@ def batch_delete_images():
                 pass
 
             # 删除数据库记录
+            adjust_counter('likes', -image.like_count)
             db.session.delete(image)
             deleted_count += 1
 
+    adjust_counter('images', -deleted_count)
     db.session.commit()
     flash(f'成功删除 {deleted_count} 张图片！', 'success')
     return redirect(url_for('admin.manage_images'))
 
 
+@admin_bp.route('/images/export')
+@login_required
+def export_images():
+    """打包下载选中的图片"""
+    if not check_referer():
+        abort(403)
+
+    image_ids = request.args.getlist('image_ids', type=int)
+    if not image_ids:
+        flash('请选择要下载的图片', 'error')
+        return redirect(url_for('admin.manage_images'))
+
+    query = Image.query.filter(Image.id.in_(image_ids)).order_by(Image.upload_date.desc())
+    filenames = [row.filename for row in query.with_entities(Image.filename)]
+    return zip_download(filenames, f'壁纸_{len(filenames)}张.zip')
+
+
 @admin_bp.route('/tags')
 @login_required
 def manage_tags():
@@ -498,6 +659,7 @@ def delete_tag(tag_id):
     """删除标签"""
     tag = Tag.query.get_or_404(tag_id)
     db.session.delete(tag)
+    adjust_counter('tags', -1)
     db.session.commit()
     flash('标签删除成功！', 'success')
     return redirect(url_for('admin.manage_tags'))
@@ -507,6 +669,8 @@ def delete_tag(tag_id):
 @login_required
 def manage_announcement():
     """管理公告"""
+    from app import cache
+
     announcement = Announcement.query.first()
     if not announcement:
         announcement = Announcement(content='')
@@ -515,8 +679,13 @@ def manage_announcement():
 
     if request.method == 'POST':
         content = request.form.get('content', '')
+        old_key = announcement_cache_key(announcement.content)
         announcement.content = content
         db.session.commit()
+
+        # 保存时渲染一次，首页直接输出缓存的HTML片段
+        cache.delete(old_key)
+        cache.set(announcement_cache_key(content), render_markdown(content), timeout=0)
         flash('公告更新成功！', 'success')
         return redirect(url_for('admin.manage_announcement'))
 
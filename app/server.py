@@ -0,0 +1,305 @@
+"""生产环境服务器：预加载应用后 fork 多个 worker 进程，每个进程使用固定大小的线程池
+
+启动方式见项目根目录的 serve.py：
+    python serve.py --bind 0.0.0.0:5000 --workers 4 --threads 8
+
+信号：
+    SIGTERM / SIGINT  平滑关闭：worker 停止接受新连接，处理完已有请求后退出
+    SIGHUP            平滑重载：启动新的主进程（重新读取代码和配置，继承监听 socket），
+                      新一代 worker 全部就绪后旧主进程再平滑关闭自己的 worker 并退出
+    SIGTTIN / SIGTTOU 增加 / 减少一个 worker
+
+主进程退出（包括被 SIGKILL）后，worker 会在一秒内发现并平滑退出。
+"""
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+# 重载时通过环境变量把监听 socket 和旧主进程的 pid 传给新的主进程
+FD_ENV = 'GALLERY_SERVER_FD'
+PARENT_ENV = 'GALLERY_SERVER_PARENT'
+
+_start_hooks = []
+_stop_hooks = []
+
+
+def on_worker_start(func):
+    """注册 worker 启动钩子（在 fork 之后、开始处理请求之前，于应用上下文中调用）
+
+    后台线程无法跨 fork 保留，需要后台线程的子系统应在这里启动。
+    """
+    _start_hooks.append(func)
+    return func
+
+
+def on_worker_stop(func):
+    """注册 worker 停止钩子（所有在途请求处理完毕后，于应用上下文中调用）"""
+    _stop_hooks.append(func)
+    return func
+
+
+def _log(message):
+    print(f'[server {os.getpid()}] {message}', file=sys.stderr, flush=True)
+
+
+class PooledRequestHandler(WSGIRequestHandler):
+    """每个请求后关闭连接，避免空闲的 keep-alive 连接长期占用线程池（前面应有反向代理）"""
+    protocol_version = 'HTTP/1.0'
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """使用固定大小线程池处理请求的 WSGI 服务器
+
+    线程池占满时不再 accept，新连接留在内核队列中由其他 worker 进程接收。
+    """
+
+    multithread = True
+    multiprocess = True
+
+    def __init__(self, host, port, app, threads, fd):
+        super().__init__(host, port, app, handler=PooledRequestHandler, fd=fd)
+        # 多个进程共享同一个监听 socket，accept 可能被其他进程抢先，必须非阻塞
+        self.socket.setblocking(False)
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='gallery-request')
+        self._slots = threading.BoundedSemaphore(threads)
+
+    def get_request(self):
+        self._slots.acquire()
+        try:
+            return super().get_request()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def process_request(self, request, client_address):
+        self._executor.submit(self._process_request_thread, request, client_address)
+
+    def _process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def drain(self):
+        """等待所有在途请求处理完毕"""
+        self._executor.shutdown(wait=True)
+
+
+class Arbiter:
+    """主进程：持有监听 socket，负责创建、回收和重启 worker"""
+
+    def __init__(self, app, host, port, workers, threads, graceful_timeout):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.num_workers = workers
+        self.threads = threads
+        self.graceful_timeout = graceful_timeout
+        self.workers = {}  # pid -> 启动时间
+        self._signals = []
+        self.sock = None
+        self.new_master = None  # 重载中启动的新主进程
+        self.old_master = None  # 本进程由重载启动时，等待退出的旧主进程
+        self.ready_workers = set()
+        # worker 完成启动钩子后写入自己的 pid
+        self._ready_r, self._ready_w = os.pipe()
+        os.set_blocking(self._ready_r, False)
+
+    def run(self):
+        self.sock = self._listen()
+        old_master = os.environ.pop(PARENT_ENV, None)
+        self.old_master = int(old_master) if old_master else None
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGTTIN, signal.SIGTTOU):
+            signal.signal(sig, lambda signum, frame: self._signals.append(signum))
+        _log(f'listening on {self.host}:{self.port} '
+             f'({self.num_workers} workers x {self.threads} threads)')
+
+        while True:
+            self._reap_workers()
+            while self._signals:
+                signum = self._signals.pop(0)
+                if signum in (signal.SIGTERM, signal.SIGINT):
+                    _log('shutting down')
+                    self._stop_workers()
+                    self.sock.close()
+                    return
+                if signum == signal.SIGHUP:
+                    self._reload()
+                elif signum == signal.SIGTTIN:
+                    self.num_workers += 1
+                elif signum == signal.SIGTTOU and self.num_workers > 1:
+                    self.num_workers -= 1
+                    self._kill_worker(next(iter(self.workers)), signal.SIGTERM)
+            self._manage_workers()
+            self._check_ready()
+            time.sleep(0.2)
+
+    def _listen(self):
+        fd = os.environ.pop(FD_ENV, None)
+        if fd is not None:
+            # 由重载前的主进程继承而来
+            sock = socket.socket(fileno=int(fd))
+        else:
+            sock = socket.create_server((self.host, self.port), backlog=2048)
+        self.port = sock.getsockname()[1]
+        return sock
+
+    def _manage_workers(self):
+        while len(self.workers) < self.num_workers:
+            self._spawn_worker()
+
+    def _check_ready(self):
+        """读取 worker 的就绪通知；新一代 worker 全部就绪后通知旧主进程退出"""
+        try:
+            data = os.read(self._ready_r, 4096)
+        except BlockingIOError:
+            data = b''
+        for pid in data.split():
+            self.ready_workers.add(int(pid))
+        self.ready_workers &= set(self.workers)
+        if self.old_master and len(self.ready_workers) >= self.num_workers:
+            _log(f'new workers ready, stopping old master {self.old_master}')
+            try:
+                os.kill(self.old_master, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+            self.old_master = None
+
+    def _spawn_worker(self):
+        pid = os.fork()
+        if pid:
+            self.workers[pid] = time.monotonic()
+            return
+        # 子进程：任何情况下都不能返回到主进程的循环中
+        code = 0
+        try:
+            os.close(self._ready_r)
+            _run_worker(self.app, self.sock, self.threads, self._ready_w)
+        except BaseException as e:
+            _log(f'worker crashed: {e!r}')
+            code = 1
+        finally:
+            os._exit(code)
+
+    def _reap_workers(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+            if pid == self.new_master:
+                # 新主进程在接管前退出（如代码有错误），继续使用当前这一代 worker
+                _log(f'reload failed, new master exited with status {os.waitstatus_to_exitcode(status)}')
+                self.new_master = None
+                continue
+            if self.workers.pop(pid, None) is not None and os.waitstatus_to_exitcode(status) != 0:
+                _log(f'worker {pid} exited with status {os.waitstatus_to_exitcode(status)}')
+
+    def _kill_worker(self, pid, sig):
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            self.workers.pop(pid, None)
+
+    def _stop_workers(self):
+        """通知所有 worker 平滑退出，超时后强制结束"""
+        for pid in list(self.workers):
+            self._kill_worker(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout
+        while self.workers and time.monotonic() < deadline:
+            self._reap_workers()
+            time.sleep(0.1)
+        for pid in list(self.workers):
+            _log(f'worker {pid} did not exit in time, killing')
+            self._kill_worker(pid, signal.SIGKILL)
+        while self.workers:
+            self._reap_workers()
+            time.sleep(0.05)
+
+    def _reload(self):
+        """以相同的命令启动新的主进程，本进程的 worker 继续服务，直到新主进程发来 SIGTERM"""
+        if self.new_master is not None:
+            _log('reload already in progress')
+            return
+        _log('reloading')
+        os.set_inheritable(self.sock.fileno(), True)
+        pid = os.fork()
+        if pid:
+            self.new_master = pid
+            return
+        try:
+            os.environ[FD_ENV] = str(self.sock.fileno())
+            os.environ[PARENT_ENV] = str(os.getppid())
+            os.execv(sys.executable, [sys.executable] + sys.argv)
+        finally:
+            os._exit(1)
+
+
+def _run_worker(app, sock, threads, ready_fd):
+    """worker 进程主体"""
+    server = PooledWSGIServer(sock.getsockname()[0], sock.getsockname()[1], app, threads, fd=sock.fileno())
+
+    def stop(signum, frame):
+        # serve_forever 运行在主线程，shutdown 必须在其他线程中调用
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    def watch_master(master):
+        # 主进程退出后本进程被过继给其他进程，不能继续无人管理地运行
+        while os.getppid() == master:
+            time.sleep(1)
+        _log('master exited, shutting down')
+        server.shutdown()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    signal.signal(signal.SIGTTIN, signal.SIG_IGN)
+    signal.signal(signal.SIGTTOU, signal.SIG_IGN)
+
+    with app.app_context():
+        from app.models import db
+        # 不复用主进程中建立的数据库连接
+        db.engine.dispose(close=False)
+        for hook in _start_hooks:
+            hook()
+
+    threading.Thread(target=watch_master, args=(os.getppid(),), daemon=True).start()
+    os.write(ready_fd, f'{os.getpid()}\n'.encode('ascii'))
+    os.close(ready_fd)
+
+    try:
+        server.serve_forever()
+    finally:
+        server.drain()
+        with app.app_context():
+            for hook in _stop_hooks:
+                try:
+                    hook()
+                except Exception as e:
+                    _log(f'stop hook {hook!r} failed: {e!r}')
+
+
+def serve(app, bind=None, workers=None, threads=None, graceful_timeout=None):
+    """以预派生的多进程 x 多线程方式运行应用，参数缺省时读取应用配置"""
+    bind = bind or app.config['SERVER_BIND']
+    host, _, port = bind.rpartition(':')
+    Arbiter(
+        app,
+        host or '0.0.0.0',
+        int(port),
+        workers or app.config['SERVER_WORKERS'] or os.cpu_count() or 1,
+        threads or app.config['SERVER_THREADS'],
+        graceful_timeout or app.config['SERVER_GRACEFUL_TIMEOUT'],
+    ).run()
+
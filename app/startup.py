@@ -0,0 +1,111 @@
+import hashlib
+import hmac
+import os
+import secrets
+
+from sqlalchemy import event
+from sqlalchemy.exc import DatabaseError
+from sqlalchemy.schema import CreateIndex, CreateTable
+from werkzeug.security import generate_password_hash
+
+from app.models import db, AppMeta
+
+
+def configure_sqlite(app):
+    """为 SQLite 连接设置 PRAGMA（默认 WAL 日志 + synchronous=NORMAL，避免每次提交都等待磁盘同步）"""
+    if db.engine.dialect.name != 'sqlite':
+        return
+    pragmas = app.config.get('SQLITE_PRAGMAS') or {}
+
+    @event.listens_for(db.engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+
+def get_meta(key):
+    """读取应用元数据，表尚不存在时返回None"""
+    try:
+        meta = db.session.get(AppMeta, key)
+    except DatabaseError:
+        db.session.rollback()
+        return None
+    return meta.value if meta else None
+
+
+def set_meta(**values):
+    """写入应用元数据并提交"""
+    for key, value in values.items():
+        db.session.merge(AppMeta(key=key, value=value))
+    db.session.commit()
+
+
+def schema_version():
+    """根据模型生成的建表语句计算数据库结构版本，模型变化时版本随之变化"""
+    digest = hashlib.sha256()
+    for table in db.metadata.sorted_tables:
+        digest.update(str(CreateTable(table).compile(db.engine)).encode('utf-8'))
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            digest.update(str(CreateIndex(index).compile(db.engine)).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def ensure_schema():
+    """只有数据库结构版本变化时才执行 create_all（会逐表检查是否存在），否则直接跳过"""
+    version = schema_version()
+    if get_meta('schema_version') == version:
+        return False
+    db.create_all()
+    set_meta(schema_version=version)
+    return True
+
+
+def _install_key(app):
+    """本机随机生成的密钥，保存在 instance 目录而不是数据库中"""
+    path = os.path.join(app.instance_path, 'admin_password.key')
+    if not os.path.exists(path):
+        os.makedirs(app.instance_path, exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(secrets.token_bytes(32))
+        try:
+            # 目标已存在时失败，多个进程同时生成时只保留第一个
+            os.link(tmp_path, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(tmp_path)
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _password_fingerprint(app, password):
+    """明文密码的快速指纹，用于判断配置中的密码是否修改过
+
+    密钥只保存在本机 instance 目录中，仅拿到数据库无法用指纹快速穷举密码。
+    """
+    return hmac.new(_install_key(app), password.encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+def sync_admin_password(app):
+    """配置中的密码变化时重新计算并保存哈希，未变化时复用数据库中已保存的哈希"""
+    password = app.config['ADMIN_PASSWORD']
+    fingerprint = _password_fingerprint(app, password)
+    if get_meta('admin_password_hash') is None or get_meta('admin_password_fingerprint') != fingerprint:
+        set_meta(admin_password_hash=generate_password_hash(password),
+                 admin_password_fingerprint=fingerprint)
+
+
+def get_admin_password_hash():
+    """读取当前的管理员密码哈希（每次从数据库读取，其他 worker 修改密码后立即生效）"""
+    return get_meta('admin_password_hash')
+
+
+def save_admin_password(app, password):
+    """修改管理员密码：保存新的哈希，并更新当前进程的配置"""
+    set_meta(admin_password_hash=generate_password_hash(password),
+             admin_password_fingerprint=_password_fingerprint(app, password))
+    app.config['ADMIN_PASSWORD'] = password
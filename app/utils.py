@@ -1,5 +1,7 @@
 import os
-from PIL import Image
+from html import escape
+from html.parser import HTMLParser
+from urllib.parse import urlparse
 from werkzeug.utils import secure_filename
 from flask import current_app
 
@@ -12,6 +14,9 @@ def allowed_file(filename):
 
 def create_thumbnail(image_path, thumbnail_path, size=(400, 400)):
     """创建缩略图"""
+    # Pillow 只在上传时用到，延迟导入以加快启动
+    from PIL import Image
+
     try:
         with Image.open(image_path) as img:
             # 转换RGBA为RGB（处理PNG透明背景）
@@ -34,10 +39,92 @@ def create_thumbnail(image_path, thumbnail_path, size=(400, 400)):
 
 
 def get_client_ip(request):
-    """获取客户端IP地址"""
-    if request.headers.get('X-Forwarded-For'):
-        return request.headers.get('X-Forwarded-For').split(',')[0]
-    elif request.headers.get('X-Real-IP'):
-        return request.headers.get('X-Real-IP')
-    else:
-        return request.remote_addr
+    """获取客户端IP地址
+
+    反向代理后由 ProxyFix 按 PROXY_COUNT 从 X-Forwarded-For 中取出代理记录的地址，
+    不直接读取请求头：其首个值由客户端提供，可以任意伪造。
+    """
+    return request.remote_addr
+
+
+# Markdown 渲染结果中允许保留的标签及其属性
+ALLOWED_TAGS = {
+    'p': (), 'br': (), 'hr': (),
+    'h1': (), 'h2': (), 'h3': (), 'h4': (), 'h5': (), 'h6': (),
+    'strong': (), 'em': (), 'b': (), 'i': (), 'del': (), 'code': (), 'pre': (), 'blockquote': (),
+    'ul': (), 'ol': ('start',), 'li': (),
+    'table': (), 'thead': (), 'tbody': (), 'tr': (), 'th': ('align',), 'td': ('align',),
+    'a': ('href', 'title'), 'img': ('src', 'alt', 'title'),
+}
+VOID_TAGS = {'br', 'hr', 'img'}
+ALLOWED_URL_SCHEMES = {'', 'http', 'https', 'mailto'}
+DROP_CONTENT_TAGS = {'script', 'style'}
+
+
+class _HTMLSanitizer(HTMLParser):
+    """基于白名单的HTML清理器，不在白名单中的标签只保留其文本"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.open_tags = []
+        self.skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROP_CONTENT_TAGS:
+            self.skip_depth += 1
+            return
+        if tag not in ALLOWED_TAGS or self.skip_depth:
+            return
+        kept = []
+        for name, value in attrs:
+            if name not in ALLOWED_TAGS[tag] or value is None:
+                continue
+            if name in ('href', 'src') and urlparse(value.strip()).scheme.lower() not in ALLOWED_URL_SCHEMES:
+                continue
+            kept.append(f' {name}="{escape(value)}"')
+        if tag == 'a':
+            kept.append(' rel="nofollow noopener"')
+        self.parts.append(f'<{tag}{"".join(kept)}>')
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag in DROP_CONTENT_TAGS:
+            self.skip_depth -= 1
+
+    def handle_endtag(self, tag):
+        if tag in DROP_CONTENT_TAGS:
+            self.skip_depth = max(self.skip_depth - 1, 0)
+            return
+        if tag in self.open_tags and not self.skip_depth:
+            # 关闭该标签及其内部未闭合的标签，保证输出结构完整
+            while self.open_tags:
+                open_tag = self.open_tags.pop()
+                self.parts.append(f'</{open_tag}>')
+                if open_tag == tag:
+                    break
+
+    def handle_data(self, data):
+        if not self.skip_depth:
+            self.parts.append(escape(data, quote=False))
+
+    def get_html(self):
+        self.close()
+        return ''.join(self.parts) + ''.join(f'</{tag}>' for tag in reversed(self.open_tags))
+
+
+def sanitize_html(html):
+    """清理HTML，只保留白名单中的标签和属性"""
+    sanitizer = _HTMLSanitizer()
+    sanitizer.feed(html)
+    return sanitizer.get_html()
+
+
+def render_markdown(text):
+    """将Markdown渲染为清理后的HTML片段"""
+    import markdown
+
+    html = markdown.markdown(text or '', extensions=['fenced_code', 'tables', 'sane_lists'])
+    return sanitize_html(html)
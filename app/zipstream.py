@@ -0,0 +1,211 @@
+"""流式生成 ZIP 压缩包（存储模式，不压缩）
+
+归档的字节布局只取决于文件名和文件大小，因此在读取任何文件内容之前就能确定总长度，
+并能从任意偏移量开始生成，用于支持断点续传（HTTP Range）。
+CRC32 写在每个文件数据之后的数据描述符中，顺序下载时每个文件只读取一次。
+"""
+import hashlib
+import os
+import struct
+import time
+import zlib
+
+CHUNK_SIZE = 64 * 1024
+CRC_CACHE_TIMEOUT = 24 * 3600  # 缓存的 CRC32 保留一天，足够断点续传，过期后按需重新计算
+
+ZIP32_LIMIT = 0xFFFFFFFF
+FLAGS = 0x0008 | 0x0800  # 使用数据描述符 | 文件名为 UTF-8
+
+
+class ZipEntry:
+    """归档中的一个文件"""
+
+    def __init__(self, arcname, path):
+        stat = os.stat(path)
+        self.arcname = arcname
+        self.name_bytes = arcname.encode('utf-8')
+        self.path = path
+        self.size = stat.st_size
+        self.mtime_ns = stat.st_mtime_ns
+        self.crc = None
+        self.offset = 0  # 本地文件头在归档中的偏移量
+
+        t = time.localtime(stat.st_mtime)
+        year = min(max(t.tm_year, 1980), 2107)
+        self.dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+        self.dos_date = ((year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+
+    @property
+    def crc_key(self):
+        return f'zip_crc32:{self.path}:{self.size}:{self.mtime_ns}'
+
+
+class ZipStream:
+    """按需生成 ZIP 字节流
+
+    crc_cache 为可选的缓存对象（需要 get/set 方法），用于在多次请求之间复用 CRC32，
+    续传时无需重新读取之前的文件。
+    """
+
+    def __init__(self, files, crc_cache=None):
+        self.entries = []
+        names = set()
+        for arcname, path in files:
+            if not os.path.isfile(path) or arcname in names:
+                continue
+            names.add(arcname)
+            self.entries.append(ZipEntry(arcname, path))
+        self.crc_cache = crc_cache
+
+        # 文件或归档超过 4GB、或文件数超过 65535 时使用 ZIP64 格式
+        estimate = sum(self._local_header_size(e, True) + e.size + 24 + self._central_size(e, True)
+                       for e in self.entries)
+        self.zip64 = estimate >= ZIP32_LIMIT or len(self.entries) >= 0xFFFF
+
+        self.segments = []  # (起始偏移量, 长度, 生成函数)
+        offset = 0
+        for entry in self.entries:
+            entry.offset = offset
+            offset = self._add_segment(offset, self._local_header_size(entry, self.zip64),
+                                       lambda e=entry: self._local_header(e))
+            offset = self._add_segment(offset, entry.size, entry, is_data=True)
+            offset = self._add_segment(offset, 24 if self.zip64 else 16,
+                                       lambda e=entry: self._data_descriptor(e))
+        self.central_offset = offset
+        self.central_size = sum(self._central_size(e, self.zip64) for e in self.entries)
+        offset = self._add_segment(offset, self.central_size + self._end_size(),
+                                   lambda: self._central_directory())
+        self.size = offset
+
+    def _add_segment(self, offset, length, producer, is_data=False):
+        self.segments.append((offset, length, producer, is_data))
+        return offset + length
+
+    @property
+    def etag(self):
+        """由文件列表、大小和修改时间决定，用于校验续传请求（If-Range）"""
+        digest = hashlib.sha256()
+        for entry in self.entries:
+            digest.update(f'{entry.arcname}\0{entry.size}\0{entry.mtime_ns}\n'.encode('utf-8'))
+        return digest.hexdigest()[:32]
+
+    # ---------- 结构大小 ----------
+
+    @staticmethod
+    def _local_header_size(entry, zip64):
+        return 30 + len(entry.name_bytes) + (20 if zip64 else 0)
+
+    @staticmethod
+    def _central_size(entry, zip64):
+        return 46 + len(entry.name_bytes) + (28 if zip64 else 0)
+
+    def _end_size(self):
+        return 22 + (56 + 20 if self.zip64 else 0)
+
+    # ---------- 结构内容 ----------
+
+    def _local_header(self, entry):
+        version = 45 if self.zip64 else 20
+        if self.zip64:
+            extra = struct.pack('<HHQQ', 0x0001, 16, 0, 0)
+            sizes = (ZIP32_LIMIT, ZIP32_LIMIT)
+        else:
+            extra = b''
+            sizes = (0, 0)
+        return struct.pack('<IHHHHHIIIHH', 0x04034b50, version, FLAGS, 0,
+                           entry.dos_time, entry.dos_date, 0, sizes[0], sizes[1],
+                           len(entry.name_bytes), len(extra)) + entry.name_bytes + extra
+
+    def _data_descriptor(self, entry):
+        crc = self._crc(entry)
+        if self.zip64:
+            return struct.pack('<IIQQ', 0x08074b50, crc, entry.size, entry.size)
+        return struct.pack('<IIII', 0x08074b50, crc, entry.size, entry.size)
+
+    def _central_directory(self):
+        parts = []
+        for entry in self.entries:
+            crc = self._crc(entry)
+            if self.zip64:
+                extra = struct.pack('<HHQQQ', 0x0001, 24, entry.size, entry.size, entry.offset)
+                size, offset, version = ZIP32_LIMIT, ZIP32_LIMIT, 45
+            else:
+                extra = b''
+                size, offset, version = entry.size, entry.offset, 20
+            parts.append(struct.pack('<IHHHHHHIIIHHHHHII', 0x02014b50, version, version, FLAGS, 0,
+                                     entry.dos_time, entry.dos_date, crc, size, size,
+                                     len(entry.name_bytes), len(extra), 0, 0, 0, 0, offset))
+            parts.append(entry.name_bytes)
+            parts.append(extra)
+
+        count = len(self.entries)
+        if self.zip64:
+            end64_offset = self.central_offset + self.central_size
+            parts.append(struct.pack('<IQHHIIQQQQ', 0x06064b50, 44, 45, 45, 0, 0,
+                                     count, count, self.central_size, self.central_offset))
+            parts.append(struct.pack('<IIQI', 0x07064b50, 0, end64_offset, 1))
+            parts.append(struct.pack('<IHHHHIIH', 0x06054b50, 0, 0, 0xFFFF, 0xFFFF,
+                                     ZIP32_LIMIT, ZIP32_LIMIT, 0))
+        else:
+            parts.append(struct.pack('<IHHHHIIH', 0x06054b50, 0, 0, count, count,
+                                     self.central_size, self.central_offset, 0))
+        return b''.join(parts)
+
+    # ---------- CRC32 ----------
+
+    def _crc(self, entry):
+        if entry.crc is None and self.crc_cache is not None:
+            entry.crc = self.crc_cache.get(entry.crc_key)
+        if entry.crc is None:
+            # 续传时跳过了该文件的数据，需要单独读取一遍计算 CRC
+            crc = 0
+            with open(entry.path, 'rb') as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                    crc = zlib.crc32(chunk, crc)
+            self._remember_crc(entry, crc)
+        return entry.crc
+
+    def _remember_crc(self, entry, crc):
+        entry.crc = crc
+        if self.crc_cache is not None:
+            self.crc_cache.set(entry.crc_key, crc, timeout=CRC_CACHE_TIMEOUT)
+
+    def _iter_data(self, entry, start, stop):
+        """读取文件 [start, stop) 范围的数据；从头读取完整文件时顺便计算 CRC"""
+        whole = start == 0 and stop == entry.size and entry.crc is None
+        crc = 0
+        with open(entry.path, 'rb') as f:
+            f.seek(start)
+            remaining = stop - start
+            while remaining > 0:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    raise IOError(f'{entry.path} 在导出过程中被修改')
+                remaining -= len(chunk)
+                if whole:
+                    crc = zlib.crc32(chunk, crc)
+                yield chunk
+        if whole:
+            self._remember_crc(entry, crc)
+
+    # ---------- 输出 ----------
+
+    def iter_range(self, start=0, stop=None):
+        """生成归档中 [start, stop) 范围的字节"""
+        stop = self.size if stop is None else min(stop, self.size)
+        for seg_start, length, producer, is_data in self.segments:
+            seg_stop = seg_start + length
+            if seg_stop <= start or length == 0:
+                continue
+            if seg_start >= stop:
+                break
+            lo = max(start, seg_start) - seg_start
+            hi = min(stop, seg_stop) - seg_start
+            if is_data:
+                yield from self._iter_data(producer, lo, hi)
+            else:
+                data = producer()
+                yield data[lo:hi]
+
+    def __iter__(self):
+        return self.iter_range()
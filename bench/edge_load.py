@@ -0,0 +1,64 @@
+"""模拟画廊访客：打开 /gallery、滚动加载一次、打开一张详情页，并请求页面上的全部图片（带 Referer）
+
+    python bench/edge_load.py 127.0.0.1:8000 --clients 8 --duration 15
+"""
+import argparse
+import html
+import http.cookiejar
+import json
+import multiprocessing
+import random
+import re
+import time
+import urllib.error
+import urllib.request
+
+parser = argparse.ArgumentParser(description='画廊访客模拟')
+parser.add_argument('address', help='代理地址，例如 127.0.0.1:8000')
+parser.add_argument('--clients', type=int, default=8, help='并发访客进程数')
+parser.add_argument('--duration', type=float, default=15, help='持续秒数')
+
+
+def visitor(args):
+    address, duration = args
+    base = f'http://{address}'
+    visits = images = forbidden = errors = 0
+    deadline = time.time() + duration
+    while time.time() < deadline:
+        # 每次访问都是新的会话
+        opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+        def get(path, referer=None):
+            request = urllib.request.Request(base + path, headers={'Referer': referer} if referer else {})
+            try:
+                with opener.open(request, timeout=10) as response:
+                    return response.read()
+            except urllib.error.HTTPError as e:
+                return e.code
+
+        page = get('/gallery').decode('utf-8')
+        sources = re.findall(r'src="(/thumbnails/[^"]+)"', page)
+        more = json.loads(get('/api/gallery/load-more?offset=24&limit=12', base + '/gallery'))
+        sources += [image['thumbnail'] for image in more['images']]
+        details = re.findall(r'href="(/image/\d+)"', page)
+        if details:
+            sources += re.findall(r'src="(/uploads/[^"]+)"', get(random.choice(details)).decode('utf-8'))
+
+        for source in sources:
+            result = get(html.unescape(source), base + '/gallery')
+            images += 1
+            if result == 403:
+                forbidden += 1
+            elif isinstance(result, int):
+                errors += 1
+        visits += 1
+    return visits, images, forbidden, errors
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    with multiprocessing.Pool(args.clients) as pool:
+        results = pool.map(visitor, [(args.address, args.duration)] * args.clients)
+    visits, images, forbidden, errors = (sum(r[i] for r in results) for i in range(4))
+    print(f'visits={visits} ({visits / args.duration:.1f}/s) images={images} '
+          f'({images / args.duration:.1f}/s) 403={forbidden} errors={errors}')
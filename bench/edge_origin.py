@@ -0,0 +1,33 @@
+"""缓存命中率测试用的源站：以 serve.py 相同的方式启动，图片目录指向 bench/seed.py --media 生成的文件
+
+    python bench/edge_origin.py sqlite:////tmp/bench.db /tmp/bench-media --bind 127.0.0.1:5000 [--signed]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+parser = argparse.ArgumentParser(description='缓存命中率测试源站')
+parser.add_argument('database_url')
+parser.add_argument('media', help='包含 uploads/ 和 thumbnails/ 的目录')
+parser.add_argument('--bind', default='127.0.0.1:5000')
+parser.add_argument('--workers', type=int, default=1)
+parser.add_argument('--threads', type=int, default=4)
+parser.add_argument('--signed', action='store_true', help='使用签名图片地址（SIGNED_URLS）')
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    os.environ['DATABASE_URL'] = args.database_url
+
+    from app import create_app
+    from app.config import Config
+    from app.server import serve
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = args.database_url
+        UPLOAD_FOLDER = os.path.join(args.media, 'uploads')
+        THUMBNAIL_FOLDER = os.path.join(args.media, 'thumbnails')
+        SIGNED_URLS = args.signed
+
+    serve(create_app(BenchConfig), args.bind, args.workers, args.threads)
@@ -0,0 +1,99 @@
+"""简易缓存反向代理，代替 nginx proxy_cache 测量图片的缓存命中率
+
+缓存判定与 nginx 默认行为一致：只缓存 200 响应；带 no-cache / no-store / private、
+Set-Cookie 或 Vary: * / Referer / Cookie 的响应不缓存；有效期取 Cache-Control 的 max-age。
+访问 /__stats 返回图片请求的命中统计（JSON）。
+
+    python bench/edge_proxy.py 127.0.0.1:8000 127.0.0.1:5000
+"""
+import argparse
+import http.client
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FORWARDED_HEADERS = ('Referer', 'Cookie', 'Accept-Encoding', 'If-None-Match', 'If-Modified-Since')
+HOP_HEADERS = ('connection', 'transfer-encoding', 'date', 'server')
+
+parser = argparse.ArgumentParser(description='缓存反向代理')
+parser.add_argument('listen', help='监听地址，例如 127.0.0.1:8000')
+parser.add_argument('origin', help='源站地址，例如 127.0.0.1:5000')
+
+
+def cache_ttl(status, headers):
+    """按 nginx 的规则返回可缓存的秒数，不可缓存时返回0"""
+    if status != 200 or 'set-cookie' in headers:
+        return 0
+    cache_control = headers.get('cache-control', '').lower()
+    if any(directive in cache_control for directive in ('no-cache', 'no-store', 'private')):
+        return 0
+    vary = headers.get('vary', '').lower()
+    if '*' in vary or 'referer' in vary or 'cookie' in vary:
+        return 0
+    for directive in cache_control.split(','):
+        directive = directive.strip()
+        if directive.startswith('max-age='):
+            return int(directive[len('max-age='):])
+    return 0
+
+
+def make_handler(origin_host, origin_port):
+    cache = {}  # path -> (status, headers, body, 过期时间)
+    stats = {'hit': 0, 'miss': 0, 'uncacheable': 0, 'other': 0}
+    lock = threading.Lock()
+
+    class CachingProxyHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.0'
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path == '/__stats':
+                self._reply(200, [('Content-Type', 'application/json')], json.dumps(stats).encode())
+                return
+
+            now = time.time()
+            with lock:
+                entry = cache.get(self.path)
+            if entry and entry[3] > now:
+                status, headers, body, _ = entry
+                result = 'hit'
+            else:
+                conn = http.client.HTTPConnection(origin_host, origin_port, timeout=10)
+                conn.request('GET', self.path, headers={name: self.headers[name]
+                                                        for name in FORWARDED_HEADERS if self.headers.get(name)})
+                response = conn.getresponse()
+                body = response.read()
+                conn.close()
+                status, headers = response.status, response.getheaders()
+                ttl = cache_ttl(status, {name.lower(): value for name, value in headers})
+                if ttl:
+                    with lock:
+                        cache[self.path] = (status, headers, body, now + ttl)
+                    result = 'miss'
+                else:
+                    result = 'uncacheable'
+
+            image = self.path.startswith(('/uploads/', '/thumbnails/'))
+            with lock:
+                stats[result if image else 'other'] += 1
+            self._reply(status, headers + [('X-Cache', result.upper())], body)
+
+        def _reply(self, status, headers, body):
+            self.send_response(status)
+            for name, value in headers:
+                if name.lower() not in HOP_HEADERS:
+                    self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+    return CachingProxyHandler
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    host, _, port = args.listen.rpartition(':')
+    origin_host, _, origin_port = args.origin.rpartition(':')
+    ThreadingHTTPServer((host, int(port)), make_handler(origin_host, int(origin_port))).serve_forever()
@@ -0,0 +1,56 @@
+"""点赞接口压测：多个客户端进程并发 POST /api/like/<id>，统计 200 和 429 的速率
+
+    users 模式每个请求使用不同的 X-Forwarded-For（模拟反向代理后的大量不同用户），
+    bot 模式所有请求来自同一IP。服务器需保持默认的 PROXY_COUNT = 1。
+
+    python bench/likeload.py 127.0.0.1:5000 users --clients 8 --duration 10 --images 200
+"""
+import argparse
+import http.client
+import multiprocessing
+import random
+import time
+
+parser = argparse.ArgumentParser(description='点赞接口压测')
+parser.add_argument('address', help='服务器地址，例如 127.0.0.1:5000')
+parser.add_argument('mode', choices=['users', 'bot'])
+parser.add_argument('--clients', type=int, default=8, help='并发客户端进程数')
+parser.add_argument('--duration', type=float, default=10, help='持续秒数')
+parser.add_argument('--images', type=int, default=200, help='随机点赞的图片ID范围')
+
+
+def client(args):
+    address, mode, duration, images, client_id = args
+    host, _, port = address.rpartition(':')
+    ok = limited = errors = 0
+    deadline = time.time() + duration
+    i = 0
+    while time.time() < deadline:
+        i += 1
+        ip = '10.0.0.1' if mode == 'bot' else f'10.{client_id}.{i // 250 % 250}.{i % 250}'
+        try:
+            conn = http.client.HTTPConnection(host, int(port), timeout=10)
+            conn.request('POST', f'/api/like/{random.randint(1, images)}', headers={'X-Forwarded-For': ip})
+            response = conn.getresponse()
+            response.read()
+            conn.close()
+        except OSError:
+            errors += 1
+            continue
+        if response.status == 200:
+            ok += 1
+        elif response.status == 429:
+            limited += 1
+        else:
+            errors += 1
+    return ok, limited, errors
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    tasks = [(args.address, args.mode, args.duration, args.images, n) for n in range(args.clients)]
+    with multiprocessing.Pool(args.clients) as pool:
+        results = pool.map(client, tasks)
+    ok, limited, errors = (sum(r[i] for r in results) for i in range(3))
+    print(f'{args.mode} clients={args.clients}: {(ok + limited) / args.duration:.1f} req/s '
+          f'(200: {ok / args.duration:.1f}/s, 429: {limited / args.duration:.1f}/s), errors={errors}')
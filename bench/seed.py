@@ -0,0 +1,44 @@
+"""生成压测用的数据库：N 张图片、10 个标签
+
+    python bench/seed.py sqlite:////tmp/bench.db --images 200 [--media /tmp/bench-media]
+
+指定 --media 时在该目录的 uploads/ 和 thumbnails/ 下生成对应的随机内容文件（原图 300KB，缩略图 30KB）。
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+parser = argparse.ArgumentParser(description='生成压测数据库')
+parser.add_argument('database_url', help='数据库连接，例如 sqlite:////tmp/bench.db')
+parser.add_argument('--images', type=int, default=200, help='图片数量')
+parser.add_argument('--media', help='生成图片文件的目录')
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    os.environ['DATABASE_URL'] = args.database_url
+
+    from app import create_app
+    from app.models import db, Image, Tag
+
+    app = create_app()
+    with app.app_context():
+        if Image.query.count():
+            sys.exit('数据库中已有图片')
+        tags = [Tag(name=f't{i}') for i in range(10)]
+        for i in range(args.images):
+            image = Image(filename=f'f{i}.jpg', thumbnail=f'thumb_f{i}.jpg', title=f'img {i}')
+            image.tags = tags[i % 10:i % 10 + 2]
+            db.session.add(image)
+        db.session.commit()
+
+    if args.media:
+        for folder in ('uploads', 'thumbnails'):
+            os.makedirs(os.path.join(args.media, folder), exist_ok=True)
+        for i in range(args.images):
+            with open(os.path.join(args.media, 'uploads', f'f{i}.jpg'), 'wb') as f:
+                f.write(os.urandom(300 * 1024))
+            with open(os.path.join(args.media, 'thumbnails', f'thumb_f{i}.jpg'), 'wb') as f:
+                f.write(os.urandom(30 * 1024))
+    print(f'已生成 {args.images} 张图片')
@@ -0,0 +1,51 @@
+"""测量冷启动到第一个请求完成的耗时（import app + create_app() + 请求 /）
+
+每轮在新的解释器进程中执行，输出各阶段的中位数：
+    python bench/startup.py sqlite:////tmp/bench.db --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+parser = argparse.ArgumentParser(description='冷启动耗时测试')
+parser.add_argument('database_url', help='数据库连接（先用 bench/seed.py 生成）')
+parser.add_argument('--runs', type=int, default=5, help='测量轮数')
+parser.add_argument('--once', action='store_true', help=argparse.SUPPRESS)
+
+
+def measure_once():
+    t0 = time.perf_counter()
+    sys.path.insert(0, ROOT)
+    from app import create_app
+    t1 = time.perf_counter()
+    app = create_app()
+    t2 = time.perf_counter()
+    status = app.test_client().get('/').status_code
+    t3 = time.perf_counter()
+    print(json.dumps({'import': t1 - t0, 'create_app': t2 - t1, 'first_request': t3 - t2,
+                      'total': t3 - t0, 'status': status}))
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    os.environ['DATABASE_URL'] = args.database_url
+    if args.once:
+        measure_once()
+        sys.exit()
+
+    # 第一轮可能执行建表和静态资源生成，只用于预热
+    subprocess.run([sys.executable, __file__, args.database_url, '--once'], check=True,
+                   capture_output=True, cwd=ROOT)
+    results = []
+    for _ in range(args.runs):
+        output = subprocess.run([sys.executable, __file__, args.database_url, '--once'], check=True,
+                                capture_output=True, text=True, cwd=ROOT).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    for name in ('import', 'create_app', 'first_request', 'total'):
+        print(f'{name:<15}{statistics.median(r[name] for r in results) * 1000:>8.0f}ms')
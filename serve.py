@@ -0,0 +1,17 @@
+import argparse
+
+from app import create_app
+from app.server import serve
+
+parser = argparse.ArgumentParser(description='壁纸分享平台生产环境服务器')
+parser.add_argument('--bind', help='监听地址，例如 0.0.0.0:5000')
+parser.add_argument('--workers', type=int, help='worker 进程数，默认为 CPU 核数')
+parser.add_argument('--threads', type=int, help='每个 worker 的线程数')
+parser.add_argument('--graceful-timeout', type=float, help='平滑关闭时等待在途请求的秒数')
+
+# 在主进程中创建应用，worker 通过 fork 共享已加载的代码
+app = create_app()
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    serve(app, args.bind, args.workers, args.threads, args.graceful_timeout)